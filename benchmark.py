@@ -0,0 +1,349 @@
+"""Benchmark the bot's hot paths against an in-process fake Discord channel.
+
+Runs the slash command handlers, the remove menu callback, the board renderer
+and the /status endpoint at several catalog sizes and concurrency levels and
+reports p50/p99 latency, Discord calls per command, bytes written to disk and
+peak memory.
+
+With --snapshot it instead compares how long status.json and the binary
+snapshot take to load into a catalog, and with --memory how much memory the
+catalog uses compared with a plain {name: status} dict.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --sizes 10,1000 --concurrency 1,10 --ops 50 --json results.json
+    python benchmark.py --snapshot --sizes 1000,10000,100000
+    python benchmark.py --memory --sizes 1000,10000,100000
+"""
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+START_DIR = os.getcwd()
+
+# Run against a scratch data directory so the real status.json is untouched
+os.chdir(tempfile.mkdtemp(prefix='status-bench-'))
+sys.path.insert(0, REPO_DIR)
+logging.disable(logging.CRITICAL)
+
+import main  # noqa: E402
+
+
+class FakeMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+
+    async def edit(self, **kwargs):
+        self.channel.calls['message.edit'] += 1
+
+
+class FakeChannel:
+    """Stand-in for a nextcord text channel that counts API calls"""
+
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.calls = collections.Counter()
+        self.next_id = 1
+
+    async def send(self, **kwargs):
+        self.calls['channel.send'] += 1
+        self.next_id += 1
+        return FakeMessage(self, self.next_id)
+
+    async def fetch_message(self, message_id):
+        self.calls['channel.fetch_message'] += 1
+        return FakeMessage(self, message_id)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeResponse:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def send_message(self, *args, **kwargs):
+        self.calls['response.send_message'] += 1
+
+    async def edit_message(self, *args, **kwargs):
+        self.calls['response.edit_message'] += 1
+
+
+class FakeInteraction:
+    """Stand-in for a nextcord interaction issued by an admin"""
+
+    ids = iter(range(1, 10 ** 12))
+
+    def __init__(self, calls):
+        self.id = next(self.ids)
+        self.user = FakeUser(main.ADMIN_IDS[0])
+        self.response = FakeResponse(calls)
+
+
+def bytes_written():
+    """Bytes this process has written so far (Linux only, 0 elsewhere)"""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def seed_catalog(size):
+    """Reset the saved state to a catalog of `size` products"""
+    games = {f"Product {i:06d}": main.STATUS_CHOICES[i % len(main.STATUS_CHOICES)] for i in range(size)}
+    main.game_handler.save_data({'games': games, 'message_id': None})
+    # Force the next command to load the seeded file, as a fresh process would
+    main.game_handler.catalog = None
+    main.game_handler.board_message = None
+    main.status_cache['data'] = None
+    return list(games)
+
+
+async def make_operation(benchmark, names, calls, rng):
+    """Return a coroutine factory performing one operation of the benchmark"""
+    counter = iter(range(10 ** 9))
+
+    if benchmark == 'add_game':
+        async def op():
+            await main.add_game.callback(FakeInteraction(calls), name=f"New {next(counter)}", status='testing')
+    elif benchmark == 'set_status':
+        async def op():
+            await main.set_status.callback(FakeInteraction(calls), name=rng.choice(names), status=rng.choice(main.STATUS_CHOICES))
+    elif benchmark == 'remove_game':
+        async def op():
+            games = await main.game_handler.get_catalog()
+            if not games:
+                return
+            select = main.RemoveGameSelect(games)
+            name = rng.choice(games.names)
+            status = games.status(name)
+            select._selected_values = [name]
+            await select.callback(FakeInteraction(calls))
+            # Put it back in memory so the catalog keeps its size however many ops run
+            if games.find(name) is None:
+                games.add(name, status)
+    elif benchmark == 'create_embed':
+        games = await main.game_handler.get_catalog()
+
+        async def op():
+            main.game_handler.create_embed(games)
+    elif benchmark == 'status_endpoint':
+        async def op():
+            await main.status_endpoint(None)
+    else:
+        raise ValueError(f"Unknown benchmark: {benchmark}")
+    return op
+
+
+async def run_ops(op, ops, concurrency):
+    """Run `ops` operations with at most `concurrency` in flight, returning latencies"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed():
+        async with semaphore:
+            start = time.perf_counter()
+            await op()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(timed() for _ in range(ops)))
+    await main.discord_scheduler.join()
+    return latencies
+
+
+async def run_case(benchmark, size, concurrency, ops, seed):
+    channel = FakeChannel(main.CHANNEL_ID)
+    main.bot.get_channel = lambda channel_id: channel if channel_id == main.CHANNEL_ID else None
+    calls = channel.calls
+
+    # Latency pass
+    names = seed_catalog(size)
+    op = await make_operation(benchmark, names, calls, random.Random(seed))
+    calls.clear()
+    written = bytes_written()
+    latencies = await run_ops(op, ops, concurrency)
+    written = bytes_written() - written
+    discord_calls = sum(calls.values())
+
+    # Memory pass, kept separate because tracing slows everything down
+    names = seed_catalog(size)
+    op = await make_operation(benchmark, names, collections.Counter(), random.Random(seed))
+    tracemalloc.start()
+    await run_ops(op, ops, concurrency)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'benchmark': benchmark,
+        'catalog_size': size,
+        'concurrency': concurrency,
+        'ops': ops,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'discord_calls_per_op': discord_calls / ops,
+        'disk_bytes_per_op': written / ops,
+        'peak_memory_kb': peak / 1024,
+    }
+
+
+BENCHMARKS = ['add_game', 'set_status', 'remove_game', 'create_embed', 'status_endpoint']
+
+
+async def run(args):
+    # Measure the bot, not the client-side rate limiter or the /status cache
+    main.DISCORD_BUCKET_LIMIT = 10 ** 9
+    main.WEB_STATUS_CACHE_TTL = 0
+
+    results = []
+    header = f"{'benchmark':<16}{'size':>8}{'conc':>6}{'p50 ms':>10}{'p99 ms':>10}{'calls/op':>10}{'disk B/op':>12}{'peak KB':>10}"
+    print(header)
+    print('-' * len(header))
+    for benchmark in args.benchmarks:
+        for size in args.sizes:
+            for concurrency in args.concurrency:
+                result = await run_case(benchmark, size, concurrency, args.ops, args.seed)
+                results.append(result)
+                print(f"{benchmark:<16}{size:>8}{concurrency:>6}"
+                      f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+                      f"{result['discord_calls_per_op']:>10.2f}{result['disk_bytes_per_op']:>12.0f}"
+                      f"{result['peak_memory_kb']:>10.0f}")
+    return results
+
+
+def run_snapshot(args):
+    """Compare loading status.json against the binary snapshot"""
+    handler = main.game_handler
+    results = []
+    header = f"{'size':>8}{'json ms':>10}{'binary ms':>11}{'speedup':>9}{'json KB':>10}{'binary KB':>11}"
+    print(header)
+    print('-' * len(header))
+    for size in args.sizes:
+        seed_catalog(size)
+        catalog, _ = handler.load_local_state()
+        handler.save_snapshot(catalog, 1)
+
+        def load_json():
+            data = handler.load_data()
+            main.Catalog(data.get('games', {}))
+
+        timings = {}
+        for label, load in (('json', load_json), ('binary', handler.load_snapshot)):
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                load()
+                samples.append(time.perf_counter() - start)
+            timings[label] = percentile(samples, 50) * 1000
+
+        result = {
+            'catalog_size': size,
+            'json_load_ms': timings['json'],
+            'binary_load_ms': timings['binary'],
+            'json_bytes': os.path.getsize(handler.data_file),
+            'binary_bytes': os.path.getsize(handler.snapshot_file),
+        }
+        results.append(result)
+        print(f"{size:>8}{result['json_load_ms']:>10.2f}{result['binary_load_ms']:>11.2f}"
+              f"{result['json_load_ms'] / result['binary_load_ms']:>8.1f}x"
+              f"{result['json_bytes'] / 1024:>10.0f}{result['binary_bytes'] / 1024:>11.0f}")
+    return results
+
+
+def traced_size(build):
+    """Bytes still allocated by what build() returns, measured with tracemalloc"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return result, size
+
+
+def run_memory(args):
+    """Compare the catalog's memory with the plain dict it replaced
+
+    Name strings are created beforehand and shared by both, so only the
+    structures around them are counted.
+    """
+    results = []
+    header = f"{'size':>8}{'dict KB':>10}{'catalog KB':>12}{'rendered KB':>13}{'ratio':>8}"
+    print(header)
+    print('-' * len(header))
+    for size in args.sizes:
+        games = {f"Product {i:06d}": main.STATUS_CHOICES[i % len(main.STATUS_CHOICES)] for i in range(size)}
+        names, statuses = list(games), list(games.values())
+        _, dict_bytes = traced_size(lambda: dict(zip(names, statuses)))
+        catalog, catalog_bytes = traced_size(lambda: main.Catalog(games))
+
+        def render():
+            # Sorted orders cached by the board renderer
+            list(catalog.items())
+            list(catalog.groups())
+        _, render_bytes = traced_size(render)
+
+        result = {
+            'catalog_size': size,
+            'dict_bytes': dict_bytes,
+            'catalog_bytes': catalog_bytes,
+            'rendered_catalog_bytes': catalog_bytes + render_bytes,
+        }
+        results.append(result)
+        print(f"{size:>8}{dict_bytes / 1024:>10.0f}{catalog_bytes / 1024:>12.0f}"
+              f"{(catalog_bytes + render_bytes) / 1024:>13.0f}{catalog_bytes / dict_bytes:>7.1f}x")
+    return results
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the status bot's hot paths")
+    parser.add_argument('--sizes', type=int_list, help="Catalog sizes (comma-separated)")
+    parser.add_argument('--concurrency', type=int_list, default=[1, 10, 100], help="Concurrent operations (comma-separated)")
+    parser.add_argument('--ops', type=int, default=100, help="Operations per case")
+    parser.add_argument('--benchmarks', type=lambda v: v.split(','), default=BENCHMARKS, help="Benchmarks to run (comma-separated)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for reproducible runs")
+    parser.add_argument('--snapshot', action='store_true', help="Compare JSON and binary snapshot load times")
+    parser.add_argument('--memory', action='store_true', help="Compare catalog memory with a plain dict")
+    parser.add_argument('--repeat', type=int, default=5, help="Loads per size with --snapshot")
+    parser.add_argument('--json', help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        args.sizes = args.sizes or [1000, 10000, 100000]
+        results = run_snapshot(args)
+    elif args.memory:
+        args.sizes = args.sizes or [1000, 10000, 100000]
+        results = run_memory(args)
+    else:
+        args.sizes = args.sizes or [10, 100, 1000, 10000, 50000]
+        results = asyncio.run(run(args))
+    if args.json:
+        with open(os.path.join(START_DIR, args.json), 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main_cli()
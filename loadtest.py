@@ -0,0 +1,143 @@
+"""Reproducible load generator for the bot's web server endpoints.
+
+By default the web server from main.py is started in a child process (without
+connecting to Discord) and the child measures its own event loop lag, which is
+the time the Discord gateway would have been kept waiting. Pass --url to hit
+an already running server instead.
+
+Usage:
+    python loadtest.py
+    python loadtest.py --connections 200 --duration 30 --paths /,/health,/status
+    WEB_ACCESS_LOG=false WEB_MAX_LOOP_LAG=0.05 python loadtest.py
+    python loadtest.py --url http://localhost:5000
+"""
+import argparse
+import asyncio
+import collections
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def measure_loop_lag(stop, interval=0.01):
+    """Sample how late the event loop wakes up from a short sleep"""
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+    return lags
+
+
+def serve(port, duration, ready, results):
+    """Child process: run the bot's web server and report event loop lag"""
+    os.chdir(tempfile.mkdtemp(prefix='status-loadtest-'))
+    sys.path.insert(0, REPO_DIR)
+    import main
+
+    async def run():
+        runner = await main.create_web_server(port)
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(measure_loop_lag(stop))
+        ready.set()
+        await asyncio.sleep(duration)
+        stop.set()
+        lags = await lag_task
+        await runner.cleanup()
+        results.send(lags)
+
+    asyncio.run(run())
+
+
+async def worker(session, base_url, paths, deadline, rng, stats):
+    while time.monotonic() < deadline:
+        path = rng.choice(paths)
+        start = time.perf_counter()
+        try:
+            async with session.get(base_url + path) as response:
+                await response.read()
+                stats['codes'][response.status] += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            stats['codes'][type(e).__name__] += 1
+        stats['latencies'].append(time.perf_counter() - start)
+
+
+async def generate_load(base_url, paths, connections, duration, seed):
+    stats = {'codes': collections.Counter(), 'latencies': []}
+    connector = aiohttp.TCPConnector(limit=connections)
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(
+            worker(session, base_url, paths, deadline, random.Random(seed + i), stats)
+            for i in range(connections)
+        ))
+    return stats
+
+
+def report(stats, duration, lags=None):
+    latencies = stats['latencies']
+    print(f"requests:     {len(latencies)} ({len(latencies) / duration:.0f}/s)")
+    print(f"latency p50:  {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"latency p99:  {percentile(latencies, 99) * 1000:.2f} ms")
+    print("responses:    " + ', '.join(f"{code}: {count}" for code, count in sorted(stats['codes'].items(), key=str)))
+    if lags is not None:
+        print(f"loop lag p99: {percentile(lags, 99) * 1000:.2f} ms")
+        print(f"loop lag max: {max(lags, default=0.0) * 1000:.2f} ms")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Load test the bot's web server")
+    parser.add_argument('--url', help="Base URL of a running server (default: start one in a child process)")
+    parser.add_argument('--paths', default='/,/health,/status', help="Paths to request (comma-separated)")
+    parser.add_argument('--connections', type=int, default=50, help="Concurrent client connections")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to generate load")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the request mix")
+    args = parser.parse_args()
+    paths = [path for path in args.paths.split(',') if path]
+
+    if args.url:
+        stats = asyncio.run(generate_load(args.url.rstrip('/'), paths, args.connections, args.duration, args.seed))
+        report(stats, args.duration)
+        return
+
+    port = free_port()
+    ready = multiprocessing.Event()
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    # The server outlives the load window slightly so in-flight requests finish
+    server = multiprocessing.Process(target=serve, args=(port, args.duration + 1, ready, sender))
+    server.start()
+    if not ready.wait(30):
+        server.terminate()
+        sys.exit("Web server did not start")
+
+    stats = asyncio.run(generate_load(f"http://127.0.0.1:{port}", paths, args.connections, args.duration, args.seed))
+    lags = receiver.recv()
+    server.join()
+    report(stats, args.duration, lags)
+
+
+if __name__ == '__main__':
+    main_cli()
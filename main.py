@@ -3,12 +3,31 @@ from nextcord.ext import commands
 from nextcord import SlashOption
 import json
 import os
+import array
 import asyncio
+import collections
+import contextlib
+import concurrent.futures
+import contextvars
+import functools
+import heapq
+import itertools
+import mmap
+import random
+import socket
+import sqlite3
+import struct
+import sys
+import uuid
+import zlib
 from dotenv import load_dotenv
 import aiohttp
 from aiohttp import web
 import logging
+import logging.handlers
+import signal
 import threading
+import time
 
 # Load environment variables
 load_dotenv()
@@ -25,6 +44,87 @@ ADMIN_IDS = [550322941250895882, 311036928910950401]  # Replace with your Discor
 # Port configuration - use 5000 as recommended for Replit
 PORT = int(os.environ.get('PORT', 5000))
 
+# State file format: 'json' (status.json) or 'binary' (checksummed snapshot in status.bin)
+STATE_FORMAT = os.getenv('STATE_FORMAT', 'json').lower()
+
+# Binary snapshot layout: magic, version, flags, record count, message ID (-1 for none),
+# CRC32 of the payload, payload length. The payload is a status table (u8 count, then
+# u8-length-prefixed names), one status code byte per product, the UTF-8 byte length of
+# each product name as little-endian u16, then the names back to back. Whole columns are
+# read in one call each, and any character is allowed in a name.
+SNAPSHOT_MAGIC = b'GSBS'
+SNAPSHOT_VERSION = 2
+SNAPSHOT_HEADER = struct.Struct('<4sHHIqII')
+
+# How many recent channel messages to scan for duplicate status boards at startup
+BOARD_HISTORY_LIMIT = int(os.getenv('BOARD_HISTORY_LIMIT', 50))
+
+# Seconds to finish pending board edits and webhook deliveries when shutting down
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 20))
+
+# Shared state for running several bot processes: 'file' (local status file) or 'sqlite'
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'file').strip().lower()
+if STATE_BACKEND not in ('file', 'sqlite'):
+    logger.error(f"STATE_BACKEND must be 'file' or 'sqlite', got {STATE_BACKEND!r}")
+    sys.exit(1)
+STATE_DB = os.getenv('STATE_DB', 'data/state.db')
+STATE_DB_TIMEOUT = float(os.getenv('STATE_DB_TIMEOUT', 5))
+# Seconds a process owns the status board without renewing its lease
+LEASE_TTL = float(os.getenv('LEASE_TTL', 30))
+
+# Sharding: SHARD_COUNT is a number or 'auto', SHARD_IDS the shards this process runs (comma-separated)
+SHARD_COUNT = os.getenv('SHARD_COUNT', '').strip().lower()
+SHARD_IDS = [int(shard) for shard in os.getenv('SHARD_IDS', '').split(',') if shard.strip()]
+# Fail here with a clear message rather than with nextcord's ClientException at connect time
+if SHARD_COUNT not in ('', 'auto') and not (SHARD_COUNT.isdigit() and int(SHARD_COUNT) > 0):
+    logger.error(f"SHARD_COUNT must be a positive number or 'auto', got {SHARD_COUNT!r}")
+    sys.exit(1)
+if SHARD_IDS and not SHARD_COUNT.isdigit():
+    logger.error("SHARD_IDS needs SHARD_COUNT set to the total number of shards across all processes")
+    sys.exit(1)
+if any(not 0 <= shard < int(SHARD_COUNT) for shard in SHARD_IDS):
+    logger.error(f"SHARD_IDS must be between 0 and {int(SHARD_COUNT) - 1}, got {SHARD_IDS}")
+    sys.exit(1)
+# Processes running a subset of shards must share state and board ownership
+if SHARD_IDS and STATE_BACKEND != 'sqlite':
+    logger.error("SHARD_IDS needs STATE_BACKEND=sqlite, otherwise every process edits the board and overwrites the others' changes")
+    sys.exit(1)
+
+# Replies remembered for duplicate submissions of the same command
+IDEMPOTENCY_TTL = float(os.getenv('IDEMPOTENCY_TTL', 30))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 1024))
+
+# Status board layout: 'flat' lists products alphabetically, 'grouped' lists them under each status
+BOARD_LAYOUT = os.getenv('BOARD_LAYOUT', 'flat').lower()
+
+# Web server tuning for health probes and monitors
+WEB_ACCESS_LOG = os.getenv('WEB_ACCESS_LOG', 'true').lower() in ('1', 'true', 'yes')
+WEB_KEEPALIVE_TIMEOUT = float(os.getenv('WEB_KEEPALIVE_TIMEOUT', 75))
+WEB_MAX_LOOP_LAG = float(os.getenv('WEB_MAX_LOOP_LAG', 0.1))
+WEB_STATUS_CACHE_TTL = float(os.getenv('WEB_STATUS_CACHE_TTL', 2.0))
+
+# Webhook subscribers notified of product status changes (comma-separated URLs)
+WEBHOOK_URLS = [url.strip() for url in os.getenv('WEBHOOK_URLS', '').split(',') if url.strip()]
+WEBHOOK_BATCH_SIZE = int(os.getenv('WEBHOOK_BATCH_SIZE', 50))
+WEBHOOK_FLUSH_INTERVAL = float(os.getenv('WEBHOOK_FLUSH_INTERVAL', 1.0))
+WEBHOOK_MAX_RETRIES = int(os.getenv('WEBHOOK_MAX_RETRIES', 8))
+WEBHOOK_MAX_QUEUE = int(os.getenv('WEBHOOK_MAX_QUEUE', 1000))
+WEBHOOK_POOL_SIZE = int(os.getenv('WEBHOOK_POOL_SIZE', 10))
+
+# Latency tracing (TRACE_SAMPLE_RATE is the fraction of commands traced, 0 disables)
+TRACE_FILE = os.getenv('TRACE_FILE', 'data/traces.jsonl')
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+TRACE_MAX_BYTES = int(os.getenv('TRACE_MAX_BYTES', 5 * 1024 * 1024))
+TRACE_BACKUP_COUNT = int(os.getenv('TRACE_BACKUP_COUNT', 3))
+
+# Client-side rate limit for background board edits (calls per window per route)
+DISCORD_BUCKET_LIMIT = int(os.getenv('DISCORD_BUCKET_LIMIT', 5))
+DISCORD_BUCKET_PER = float(os.getenv('DISCORD_BUCKET_PER', 5.0))
+
+# Priority of background board edits in the outbound queue, lowest value is sent first;
+# interaction replies bypass the queue and always go out before it
+PRIORITY_BOARD = 1
+
 # Status emojis and their corresponding text
 STATUS_EMOJIS = {
     'undetected': '🟢',
@@ -34,6 +134,8 @@ STATUS_EMOJIS = {
     'detected': '🔴'
 }
 
+BOARD_TITLE = "STATUS OF PRODUCTS"
+
 STATUS_CHOICES = [
     'undetected',
     'updating', 
@@ -42,14 +144,538 @@ STATUS_CHOICES = [
     'detected'
 ]
 
+# Display text for each status, computed once instead of on every render
+STATUS_TEXT = {status: status.replace('_', ' ').title() for status in STATUS_CHOICES}
+
 # Initialize bot
 intents = nextcord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+if SHARD_COUNT or SHARD_IDS:
+    bot = commands.AutoShardedBot(
+        command_prefix='!',
+        intents=intents,
+        shard_count=int(SHARD_COUNT) if SHARD_COUNT not in ('', 'auto') else None,
+        shard_ids=SHARD_IDS or None
+    )
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents)
+
+class Tracer:
+    """Record per-command timing spans to a rotating JSONL file"""
+
+    def __init__(self, path, sample_rate):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.current = contextvars.ContextVar('current_trace', default=None)
+        self.writer = None
+
+    @contextlib.contextmanager
+    def trace(self, name):
+        """Start a sampled trace; inside an existing trace this is just a span"""
+        if self.current.get() is not None:
+            with self.span(name):
+                yield
+            return
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            yield
+            return
+        
+        record = {'trace_id': uuid.uuid4().hex, 'name': name, 'timestamp': time.time(), 'spans': []}
+        start = time.perf_counter()
+        token = self.current.set((record, start))
+        try:
+            yield
+        except BaseException as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            self.current.reset(token)
+            record['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            self.write(record)
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        """Time a step of the current trace; does nothing when not tracing"""
+        active = self.current.get()
+        if active is None:
+            yield
+            return
+        
+        record, trace_start = active
+        start = time.perf_counter()
+        span = {'name': name, 'offset_ms': round((start - trace_start) * 1000, 3), **attrs}
+        try:
+            yield
+        except BaseException as e:
+            span['error'] = type(e).__name__
+            raise
+        finally:
+            span['duration_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            record['spans'].append(span)
+
+    def traced(self, name):
+        """Decorator running a coroutine function inside a trace"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.trace(name):
+                    return await func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def write(self, record):
+        if self.writer is None:
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUP_COUNT
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.writer = logging.getLogger(f"{__name__}.traces")
+            self.writer.propagate = False
+            self.writer.setLevel(logging.INFO)
+            self.writer.addHandler(handler)
+        self.writer.info(json.dumps(record))
+
+# Initialize tracing
+tracer = Tracer(TRACE_FILE, TRACE_SAMPLE_RATE)
+
+class RouteBucket:
+    """Track recent calls and 429 backoff for one Discord route"""
+
+    def __init__(self, limit, per):
+        self.limit = limit
+        self.per = per
+        self.calls = collections.deque()
+        self.blocked_until = 0.0
+
+    def delay(self):
+        """Seconds to wait before the next call on this route is allowed"""
+        now = time.monotonic()
+        while self.calls and self.calls[0] <= now - self.per:
+            self.calls.popleft()
+        wait = self.blocked_until - now
+        if len(self.calls) >= self.limit:
+            wait = max(wait, self.calls[0] + self.per - now)
+        return max(0.0, wait)
+
+    def record(self):
+        self.calls.append(time.monotonic())
+
+    def backoff(self, retry_after):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+class DiscordScheduler:
+    """Send background Discord calls by priority, always behind interaction replies"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.jobs = {}
+        self.heap = []
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.drained = asyncio.Event()
+        self.drained.set()
+        self.interactions_in_flight = 0
+        self.task = None
+        self.superseded = 0
+        self.rate_limited = 0
+
+    def bucket(self, route):
+        if route not in self.buckets:
+            self.buckets[route] = RouteBucket(DISCORD_BUCKET_LIMIT, DISCORD_BUCKET_PER)
+        return self.buckets[route]
+
+    @contextlib.asynccontextmanager
+    async def interaction(self):
+        """Hold back background calls while an interaction reply is being sent"""
+        self.interactions_in_flight += 1
+        self.idle.clear()
+        try:
+            yield
+        finally:
+            self.interactions_in_flight -= 1
+            if not self.interactions_in_flight:
+                self.idle.set()
+
+    def submit(self, priority, route, key, factory):
+        """Queue a background call; a queued call with the same key is dropped in its favour"""
+        if key in self.jobs:
+            self.superseded += 1
+        seq = next(self.counter)
+        self.jobs[key] = (seq, priority, route, factory)
+        heapq.heappush(self.heap, (priority, seq, key))
+        self.drained.clear()
+        self.wakeup.set()
+        if self.task is None or self.task.done():
+            # Fresh context so the worker doesn't inherit the submitting command's trace
+            self.task = asyncio.create_task(self.run(), context=contextvars.Context())
+
+    async def join(self):
+        """Wait until every queued call has been sent"""
+        await self.drained.wait()
+
+    async def run(self):
+        while True:
+            if not self.heap:
+                self.drained.set()
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+
+            priority, seq, key = self.heap[0]
+            job = self.jobs.get(key)
+            if job is None or job[0] != seq:
+                # Superseded by a newer call with the same key
+                heapq.heappop(self.heap)
+                continue
+
+            if not self.idle.is_set():
+                await self.idle.wait()
+                continue
+
+            delay = self.bucket(job[2]).delay()
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+
+            heapq.heappop(self.heap)
+            del self.jobs[key]
+            await self.execute(key, *job)
+
+    async def execute(self, key, seq, priority, route, factory):
+        bucket = self.bucket(route)
+        bucket.record()
+        try:
+            await factory()
+        except nextcord.HTTPException as e:
+            if e.status != 429:
+                logger.error(f"Background Discord call {key} failed: {e}")
+                return
+            self.rate_limited += 1
+            retry_after = float(e.response.headers.get('Retry-After', 1))
+            bucket.backoff(retry_after)
+            logger.warning(f"Rate limited on {route}, retrying {key} in {retry_after}s")
+            # Retry unless newer content was queued meanwhile
+            if key not in self.jobs:
+                self.submit(priority, route, key, factory)
+        except Exception as e:
+            logger.error(f"Background Discord call {key} failed: {e}")
+
+# Initialize the outbound request scheduler
+discord_scheduler = DiscordScheduler()
+
+class Catalog:
+    """Compact product catalog: names in one column, status codes in another"""
+
+    __slots__ = ('names', 'codes', 'index', 'statuses', 'status_codes',
+                 'emojis', 'texts', 'buckets', 'sorted_buckets', 'order', 'version')
+
+    def __init__(self, games=None):
+        self.names = []              # product names as stored
+        self.codes = bytearray()     # status code of each name, same order as names
+        # Lowercased name -> position in names/codes. Already-lowercase names are their
+        # own key, so only mixed-case names cost a second string
+        self.index = {}
+        # Status code tables; codes follow STATUS_CHOICES, unknown statuses are appended
+        self.statuses = list(STATUS_CHOICES)
+        self.status_codes = {status: code for code, status in enumerate(self.statuses)}
+        self.emojis = [STATUS_EMOJIS[status] for status in self.statuses]
+        self.texts = [STATUS_TEXT[status] for status in self.statuses]
+        # Names per status code, kept up to date on every change
+        self.buckets = [set() for _ in self.statuses]
+        self.sorted_buckets = [None for _ in self.statuses]
+        self.order = None            # positions in alphabetical order of name
+        self.version = 0
+        if games:
+            self.load(list(games), bytearray(self.code_for(status) for status in games.values()))
+
+    @staticmethod
+    def key(name):
+        lowered = name.lower()
+        return name if lowered == name else lowered
+
+    def load(self, names, codes):
+        """Fill an empty catalog from parallel name and status code columns"""
+        key = self.key
+        index = {key(name): position for position, name in enumerate(names)}
+        if len(index) != len(names):
+            # Names differing only in case would share one index entry; keep the first
+            first = {}
+            for position, name in enumerate(names):
+                first.setdefault(key(name), position)
+            keep = sorted(first.values())
+            logger.warning(f"Dropping {len(names) - len(keep)} products whose names differ only in case")
+            names = [names[position] for position in keep]
+            codes = bytearray(codes[position] for position in keep)
+            index = {key(name): position for position, name in enumerate(names)}
+        self.names = names
+        self.codes = codes
+        self.index = index
+        buckets = self.buckets
+        for name, code in zip(self.names, codes):
+            buckets[code].add(name)
+        self.version += 1
+
+    def __len__(self):
+        return len(self.names)
+
+    def code_for(self, status):
+        """Return the code for a status, registering statuses not in STATUS_CHOICES"""
+        code = self.status_codes.get(status)
+        if code is None:
+            code = len(self.statuses)
+            self.statuses.append(sys.intern(status))
+            self.status_codes[status] = code
+            self.emojis.append(STATUS_EMOJIS.get(status, '⚪'))
+            self.texts.append(status.replace('_', ' ').title())
+            self.buckets.append(set())
+            self.sorted_buckets.append(None)
+        return code
+
+    def find(self, name):
+        """Return the stored spelling of a product name, matched case-insensitively"""
+        position = self.index.get(name.lower())
+        return None if position is None else self.names[position]
+
+    def status(self, name):
+        return self.statuses[self.codes[self.index[name.lower()]]]
+
+    def add(self, name, status):
+        self.index[self.key(name)] = len(self.names)
+        self.names.append(name)
+        code = self.code_for(status)
+        self.codes.append(code)
+        self.buckets[code].add(name)
+        self.sorted_buckets[code] = None
+        self.order = None
+        self.version += 1
+
+    def set_status(self, name, status):
+        """Change a product's status and return the previous one"""
+        index = self.index[name.lower()]
+        name = self.names[index]
+        old_code = self.codes[index]
+        code = self.code_for(status)
+        if code != old_code:
+            self.codes[index] = code
+            self.buckets[old_code].discard(name)
+            self.buckets[code].add(name)
+            self.sorted_buckets[old_code] = None
+            self.sorted_buckets[code] = None
+        self.version += 1
+        return self.statuses[old_code]
+
+    def remove(self, name):
+        """Remove a product and return its status, or None if it isn't tracked"""
+        index = self.index.pop(name.lower(), None)
+        if index is None:
+            return None
+        name = self.names[index]
+        code = self.codes[index]
+        old_status = self.statuses[code]
+        self.buckets[code].discard(name)
+        self.sorted_buckets[code] = None
+
+        # Move the last entry into the freed slot so removal is O(1)
+        last = len(self.names) - 1
+        if index != last:
+            moved = self.names[last]
+            self.names[index] = moved
+            self.codes[index] = self.codes[last]
+            self.index[moved.lower()] = index
+        self.names.pop()
+        del self.codes[last]
+
+        self.order = None
+        self.version += 1
+        return old_status
+
+    def items(self):
+        """Yield (name, status code) pairs in alphabetical order"""
+        names = self.names
+        if self.order is None:
+            self.order = sorted(range(len(names)), key=names.__getitem__)
+        codes = self.codes
+        for position in self.order:
+            yield names[position], codes[position]
+
+    def status_counts(self):
+        """Number of products per status, without scanning the catalog"""
+        return {status: len(bucket) for status, bucket in zip(self.statuses, self.buckets)}
+
+    def groups(self):
+        """Yield (status code, alphabetical names) for every status that has products"""
+        for code, bucket in enumerate(self.buckets):
+            if not bucket:
+                continue
+            if self.sorted_buckets[code] is None:
+                self.sorted_buckets[code] = sorted(bucket)
+            yield code, self.sorted_buckets[code]
+
+    def to_dict(self):
+        statuses = self.statuses
+        return {name: statuses[code] for name, code in zip(self.names, self.codes)}
+
+def on_db_thread(method):
+    """Make a SQLiteBackend method awaitable, running it on the backend's database thread"""
+    @functools.wraps(method)
+    async def wrapper(self, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(method, self, *args))
+    return wrapper
+
+class SQLiteBackend:
+    """Catalog rows and a board ownership lease shared by several bot processes
+
+    Every query runs on one worker thread that owns the connection, so waiting up to
+    STATE_DB_TIMEOUT for another process's write lock never blocks the event loop
+    (and with it the Discord gateway heartbeat).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Unique per process, even when containers reuse the same PID
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+        self.db = None
+
+    @on_db_thread
+    def open(self):
+        self.db = sqlite3.connect(self.path, timeout=STATE_DB_TIMEOUT, isolation_level=None)
+        # WAL relies on shared memory, so every process must run on the host that stores the file
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS games (name TEXT PRIMARY KEY COLLATE NOCASE, status TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+            CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+        """)
+
+    @contextlib.contextmanager
+    def transaction(self, immediate=True):
+        """Run a transaction; immediate ones take the write lock up front"""
+        self.db.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        try:
+            yield self.db
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+        self.db.execute('COMMIT')
+
+    def get_meta(self, key):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def current_version(self):
+        return self.get_meta('version') or 0
+
+    def bump_version(self):
+        version = self.current_version() + 1
+        self.set_meta('version', version)
+        return version
+
+    @on_db_thread
+    def version(self):
+        """Catalog version, incremented by every change from any process (0 before first use)"""
+        return self.current_version()
+
+    @on_db_thread
+    def load(self):
+        """Return (games, message_id, version) from one consistent read"""
+        with self.transaction(immediate=False) as db:
+            games = dict(db.execute('SELECT name, status FROM games'))
+            return games, self.get_meta('message_id'), self.current_version()
+
+    @on_db_thread
+    def import_state(self, games, message_id):
+        """Seed an empty database, unless another process already did"""
+        with self.transaction() as db:
+            if self.current_version():
+                return self.current_version()
+            db.executemany('INSERT OR IGNORE INTO games (name, status) VALUES (?, ?)', games.items())
+            self.set_meta('message_id', message_id)
+            return self.bump_version()
+
+    @on_db_thread
+    def add(self, name, status):
+        """Insert a product and return the new version, or None if it already exists"""
+        with self.transaction() as db:
+            try:
+                db.execute('INSERT INTO games (name, status) VALUES (?, ?)', (name, status))
+            except sqlite3.IntegrityError:
+                return None
+            return self.bump_version()
+
+    @on_db_thread
+    def set_status(self, name, status):
+        """Update a product and return (old status, version), or (None, None) if it is gone"""
+        with self.transaction() as db:
+            row = db.execute('SELECT status FROM games WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                return None, None
+            db.execute('UPDATE games SET status = ? WHERE name = ?', (status, name))
+            return row[0], self.bump_version()
+
+    @on_db_thread
+    def remove(self, name):
+        """Delete a product and return (old status, version), or (None, None) if it is gone"""
+        with self.transaction() as db:
+            row = db.execute('SELECT status FROM games WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                return None, None
+            db.execute('DELETE FROM games WHERE name = ?', (name,))
+            return row[0], self.bump_version()
+
+    @on_db_thread
+    def set_message_id(self, message_id):
+        with self.transaction():
+            self.set_meta('message_id', message_id)
+
+    @on_db_thread
+    def request_refresh(self):
+        """Bump the version without a change, so the board owner re-renders on its next renewal"""
+        with self.transaction():
+            return self.bump_version()
+
+    @on_db_thread
+    def acquire_lease(self, name, ttl):
+        """Take or renew a lease; returns False while another live process holds it"""
+        now = time.time()
+        with self.transaction() as db:
+            row = db.execute('SELECT owner, expires FROM leases WHERE name = ?', (name,)).fetchone()
+            if row and row[0] != self.owner and row[1] > now:
+                return False
+            db.execute('INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)', (name, self.owner, now + ttl))
+            return True
+
+    @on_db_thread
+    def release_lease(self, name):
+        with self.transaction() as db:
+            db.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, self.owner))
+
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.db.close)
+        self.executor.shutdown()
 
 class GameStatusBot:
     def __init__(self):
         self.data_file = 'data/status.json'
+        self.snapshot_file = 'data/status.bin'
+        self.shutdown_marker_file = 'data/clean_shutdown'
+        self.clean_start = False
+        self.board_lock = asyncio.Lock()
+        self.catalog = None
+        self.message_id = None
+        self.backend = None
+        # Only the board owner edits the board; without a shared backend that is always this process
+        self.is_leader = True
+        # Board channel and message resolved once per process by reconcile_board()
+        self.board_channel = None
+        self.board_message = None
+        self.rendered_version = None
+        self.reconciled = False
         self.ensure_data_directory()
         
     def ensure_data_directory(self):
@@ -59,23 +685,235 @@ class GameStatusBot:
             
     def load_data(self):
         """Load game data from JSON file"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                pass
-        return {'games': {}, 'message_id': None}
+        with tracer.span('state_read'):
+            if os.path.exists(self.data_file):
+                try:
+                    with open(self.data_file, 'r') as f:
+                        return json.load(f)
+                except (json.JSONDecodeError, FileNotFoundError):
+                    pass
+            return {'games': {}, 'message_id': None}
     
-    def save_data(self, data):
+    def save_data(self, data, fsync=False):
         """Save game data to JSON file"""
-        with open(self.data_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        with tracer.span('persist'):
+            with open(self.data_file, 'w') as f:
+                json.dump(data, f, indent=2)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+    
+    def load_snapshot(self, verify=True):
+        """Load the catalog and message ID from the binary snapshot"""
+        with tracer.span('state_read'):
+            with open(self.snapshot_file, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if len(mm) < SNAPSHOT_HEADER.size:
+                        raise ValueError("snapshot is truncated")
+                    magic, version, _flags, count, message_id, checksum, length = SNAPSHOT_HEADER.unpack_from(mm)
+                    if magic != SNAPSHOT_MAGIC:
+                        raise ValueError("not a status snapshot")
+                    if version != SNAPSHOT_VERSION:
+                        raise ValueError(f"unsupported snapshot version {version}")
+                    start = SNAPSHOT_HEADER.size
+                    if len(mm) != start + length:
+                        raise ValueError("snapshot length does not match header")
+                    if verify and zlib.crc32(mm[start:]) != checksum:
+                        raise ValueError("snapshot checksum mismatch")
+                    
+                    status_count = mm[start]
+                    offset = start + 1
+                    statuses = []
+                    for _ in range(status_count):
+                        size = mm[offset]
+                        statuses.append(mm[offset + 1:offset + 1 + size].decode())
+                        offset += 1 + size
+                    
+                    codes = bytearray(mm[offset:offset + count])
+                    offset += count
+                    lengths = array.array('H', mm[offset:offset + 2 * count])
+                    if len(codes) != count or len(lengths) != count:
+                        raise ValueError("snapshot record count does not match header")
+                    if sys.byteorder == 'big':
+                        lengths.byteswap()
+                    blob = mm[offset + 2 * count:]
+                    ends = list(itertools.accumulate(lengths))
+                    if (ends[-1] if ends else 0) != len(blob):
+                        raise ValueError("snapshot name lengths do not match payload")
+                    names = [blob[end - length:end].decode() for end, length in zip(ends, lengths)]
+            
+            catalog = Catalog()
+            # Translate snapshot status codes to the catalog's own codes
+            remap = [catalog.code_for(status) for status in statuses]
+            if remap != list(range(len(remap))):
+                codes = codes.translate(bytes(remap + [0] * (256 - len(remap))))
+            catalog.load(names, codes)
+        return catalog, (None if message_id < 0 else message_id)
+    
+    def save_snapshot(self, catalog, message_id, fsync=False):
+        """Write the catalog and message ID as a binary snapshot"""
+        with tracer.span('persist'):
+            payload = bytearray([len(catalog.statuses)])
+            for status in catalog.statuses:
+                encoded = status.encode()
+                payload.append(len(encoded))
+                payload += encoded
+            payload += catalog.codes
+            encoded = [name.encode() for name in catalog.names]
+            lengths = array.array('H', map(len, encoded))
+            if sys.byteorder == 'big':
+                lengths.byteswap()
+            payload += lengths.tobytes()
+            payload += b''.join(encoded)
+            
+            header = SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, len(catalog),
+                -1 if message_id is None else message_id,
+                zlib.crc32(payload), len(payload)
+            )
+            # Write to a temporary file first so a crash never leaves a half-written snapshot
+            temp_file = self.snapshot_file + '.tmp'
+            with open(temp_file, 'wb') as f:
+                f.write(header)
+                f.write(payload)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp_file, self.snapshot_file)
+    
+    def load_local_state(self):
+        """Load the catalog and message ID from the snapshot or status.json"""
+        if STATE_FORMAT == 'binary':
+            try:
+                # A clean shutdown marker means the snapshot was fully written
+                return self.load_snapshot(verify=not self.clean_start)
+            except FileNotFoundError:
+                logger.info(f"No snapshot yet, migrating {self.data_file} to {self.snapshot_file}")
+            except (ValueError, IndexError, struct.error, UnicodeDecodeError) as e:
+                # status.json is older than the snapshot, and falling back to it would let the
+                # next save overwrite the snapshot, so stop and leave the file for recovery
+                logger.error(f"Snapshot {self.snapshot_file} is invalid ({e}). Restore a good copy, "
+                             f"or delete it to rebuild from {self.data_file}, which may be out of date")
+                raise RuntimeError(f"invalid snapshot {self.snapshot_file}: {e}") from e
+        
+        data = self.load_data()
+        catalog = Catalog(data.get('games', {}))
+        message_id = data.get('message_id')
+        if STATE_FORMAT == 'binary':
+            self.save_snapshot(catalog, message_id)
+        return catalog, message_id
+    
+    async def open_backend(self):
+        """Switch to the shared SQLite backend, seeding it from local files on first use"""
+        self.backend = SQLiteBackend(STATE_DB)
+        await self.backend.open()
+        self.is_leader = False
+        if not await self.backend.version():
+            catalog, message_id = self.load_local_state()
+            await self.backend.import_state(catalog.to_dict(), message_id)
+            logger.info(f"Seeded {STATE_DB} with {len(catalog)} products")
+        self.catalog = None
     
-    def create_embed(self, games):
+    async def get_catalog(self):
+        """Return the in-memory catalog, loading it on first use or after another process changed it"""
+        if self.backend:
+            if self.catalog is None or self.catalog.version != await self.backend.version():
+                games, self.message_id, version = await self.backend.load()
+                self.catalog = Catalog(games)
+                self.catalog.version = version
+        elif self.catalog is None:
+            self.catalog, self.message_id = self.load_local_state()
+        return self.catalog
+    
+    def apply_shared(self, catalog, version, change, *args):
+        """Mirror a shared write locally, or reload if other processes wrote in between"""
+        if catalog.version + 1 == version:
+            change(*args)
+        else:
+            self.catalog = None
+    
+    async def add_game(self, name, status):
+        """Add a product and save it; returns False if another process added it first"""
+        catalog = await self.get_catalog()
+        if self.backend:
+            version = await self.backend.add(name, status)
+            if version is None:
+                self.catalog = None
+                return False
+            self.apply_shared(catalog, version, catalog.add, name, status)
+        else:
+            catalog.add(name, status)
+            await self.persist()
+        return True
+    
+    async def set_game_status(self, name, status):
+        """Change a product's status and save it; returns the old status, or None if it is gone"""
+        catalog = await self.get_catalog()
+        if self.backend:
+            old_status, version = await self.backend.set_status(name, status)
+            if version is None:
+                self.catalog = None
+            else:
+                self.apply_shared(catalog, version, catalog.set_status, name, status)
+            return old_status
+        old_status = catalog.set_status(name, status)
+        await self.persist()
+        return old_status
+    
+    async def remove_games(self, names):
+        """Remove products and save; returns (name, old status) for each one removed"""
+        catalog = await self.get_catalog()
+        removed = []
+        for name in names:
+            if self.backend:
+                old_status, version = await self.backend.remove(name)
+                if version is None:
+                    continue
+                self.apply_shared(catalog, version, catalog.remove, name)
+            else:
+                old_status = catalog.remove(name)
+                if old_status is None:
+                    continue
+            removed.append((name, old_status))
+        if removed and not self.backend:
+            await self.persist()
+        return removed
+    
+    async def persist(self, fsync=False):
+        """Write the in-memory catalog and board message ID to disk"""
+        if self.backend:
+            # Products are written row by row as they change; only the board message is left
+            await self.backend.set_message_id(self.message_id)
+        elif STATE_FORMAT == 'binary':
+            self.save_snapshot(self.catalog, self.message_id, fsync)
+        else:
+            self.save_data({'games': self.catalog.to_dict(), 'message_id': self.message_id}, fsync)
+    
+    def consume_shutdown_marker(self):
+        """Check whether the previous run shut down cleanly, removing the marker"""
+        self.clean_start = os.path.exists(self.shutdown_marker_file)
+        if self.clean_start:
+            os.remove(self.shutdown_marker_file)
+        return self.clean_start
+    
+    def write_shutdown_marker(self):
+        """Record that state was flushed and the bot stopped cleanly"""
+        with open(self.shutdown_marker_file, 'w') as f:
+            json.dump({'timestamp': time.time()}, f)
+    
+    def create_summary(self, games):
+        """One line with the number of products in each status"""
+        counts = games.status_counts()
+        return ' · '.join(
+            f"{emoji} {text}: {counts[status]}"
+            for status, emoji, text in zip(games.statuses, games.emojis, games.texts)
+            if status in STATUS_TEXT or counts[status]
+        )
+    
+    def create_embed(self, games, layout=None):
         """Create the status board embed"""
         embed = nextcord.Embed(
-            title="STATUS OF PRODUCTS",
+            title=BOARD_TITLE,
             description="View status for each product. Note that this is kept up to date by admins.",
             color=0x2F3136  # Dark theme color to match Discord's dark mode
         )
@@ -87,23 +925,18 @@ class GameStatusBot:
                 inline=False
             )
         else:
-            # Sort games alphabetically
-            sorted_games = sorted(games.items())
-            
-            game_list = []
-            for game_name, status in sorted_games:
-                emoji = STATUS_EMOJIS.get(status, '⚪')
-                status_text = status.replace('_', ' ').title()
-                # Create clean format matching the new screenshot with larger circles and bullet points
-                game_list.append(f"## {emoji} {game_name}")
-                game_list.append(f"• {status_text}")
-                game_list.append("")  # Empty line for spacing
-            
-            # Remove the last empty line
-            if game_list and game_list[-1] == "":
-                game_list.pop()
-            
-            embed.description = '\n'.join(game_list) if game_list else "No products tracked yet."
+            emojis = games.emojis
+            texts = games.texts
+            if (layout or BOARD_LAYOUT) == 'grouped':
+                # One heading per status followed by its products
+                sections = [
+                    f"## {emojis[code]} {texts[code]} ({len(names)})\n" + '\n'.join(f"• {name}" for name in names)
+                    for code, names in games.groups()
+                ]
+            else:
+                # Large circles with the product name, then a bullet with the status
+                sections = [f"## {emojis[code]} {game_name}\n• {texts[code]}" for game_name, code in games.items()]
+            embed.description = self.create_summary(games) + '\n\n' + '\n\n'.join(sections)
         
         embed.set_footer(text="Last updated")
         embed.timestamp = nextcord.utils.utcnow()
@@ -112,93 +945,531 @@ class GameStatusBot:
     
     async def update_status_board(self, channel, games, message_id=None):
         """Update or create the status board message"""
-        embed = self.create_embed(games)
+        version = games.version
+        with tracer.span('render', games=len(games)):
+            embed = self.create_embed(games)
         
-        if message_id:
+        async with self.board_lock:
+            if not message_id and self.board_message is not None:
+                # Another refresh created the board while this one waited for the lock
+                message_id = self.board_message.id
+            if message_id:
+                try:
+                    # Reuse the resolved board message instead of fetching it again
+                    message = self.board_message
+                    if message is None or message.id != message_id:
+                        with tracer.span('discord.fetch_message'):
+                            message = await channel.fetch_message(message_id)
+                    with tracer.span('discord.edit'):
+                        await message.edit(embed=embed)
+                    self.board_message = message
+                    self.rendered_version = version
+                    return message_id
+                except nextcord.NotFound:
+                    # Message was deleted, create a new one
+                    self.board_message = None
+            
+            # Create new message
+            with tracer.span('discord.send'):
+                message = await channel.send(embed=embed)
+            self.board_message = message
+            self.rendered_version = version
+            return message.id
+    
+    def is_board(self, message):
+        """Check if a message is a status board posted by this bot"""
+        return message.author == bot.user and bool(message.embeds) and message.embeds[0].title == BOARD_TITLE
+    
+    async def reconcile_board(self):
+        """Resolve the board channel and message once, deleting duplicate boards"""
+        channel = bot.get_channel(CHANNEL_ID)
+        if not channel:
+            with tracer.span('discord.fetch_channel'):
+                channel = await bot.fetch_channel(CHANNEL_ID)
+        await self.get_catalog()
+        
+        # One bounded scan of recent history finds boards left behind by earlier runs
+        with tracer.span('discord.history', limit=BOARD_HISTORY_LIMIT):
+            boards = [message async for message in channel.history(limit=BOARD_HISTORY_LIMIT) if self.is_board(message)]
+        
+        board = next((message for message in boards if message.id == self.message_id), None)
+        if board is None and self.message_id:
+            # The saved board may be older than the scanned history
             try:
-                message = await channel.fetch_message(message_id)
-                await message.edit(embed=embed)
-                return message_id
+                with tracer.span('discord.fetch_message'):
+                    board = await channel.fetch_message(self.message_id)
             except nextcord.NotFound:
-                # Message was deleted, create a new one
                 pass
+        if board is None and boards:
+            # History is newest first, so adopt the most recent board
+            board = boards[0]
+        
+        for message in boards:
+            if message.id != board.id:
+                try:
+                    with tracer.span('discord.delete'):
+                        await message.delete()
+                    logger.info(f"Deleted duplicate status board {message.id}")
+                except nextcord.NotFound:
+                    pass
         
-        # Create new message
-        message = await channel.send(embed=embed)
-        return message.id
+        self.board_channel = channel
+        self.board_message = board
+        new_message_id = board.id if board else None
+        if new_message_id != self.message_id:
+            self.message_id = new_message_id
+            await self.persist()
+        
+        await self.refresh_board()
+        self.reconciled = True
+    
+    def request_board_update(self):
+        """Queue a board refresh; pending refreshes collapse into the latest one"""
+        if not self.is_leader:
+            # The board owner sees the new shared version on its next lease renewal
+            return
+        discord_scheduler.submit(PRIORITY_BOARD, f"channels/{CHANNEL_ID}/messages", 'status_board', self.refresh_board)
+    
+    @tracer.traced('board_update')
+    async def refresh_board(self):
+        """Render the current catalog onto the status board"""
+        if not self.is_leader:
+            # Queued before the lease moved to another process, which now owns the board
+            return
+        channel = self.board_channel or bot.get_channel(CHANNEL_ID)
+        if not channel:
+            logger.error(f"Could not find channel with ID {CHANNEL_ID}")
+            return
+        
+        catalog = await self.get_catalog()
+        message_id = await self.update_status_board(channel, catalog, self.message_id)
+        if message_id != self.message_id:
+            self.message_id = message_id
+            await self.persist()
+
+    async def renew_lease(self):
+        """Take or keep board ownership, then bring the board up to date if we own it"""
+        was_leader = self.is_leader
+        # Only a process whose shards include the board's guild can own the board
+        channel_visible = bot.is_ready() and bot.get_channel(CHANNEL_ID) is not None
+        self.is_leader = channel_visible and await self.backend.acquire_lease('status_board', LEASE_TTL)
+        if self.is_leader != was_leader:
+            logger.info("This process now owns the status board" if self.is_leader else "Status board is owned by another process")
+        if not self.is_leader:
+            return
+        if not was_leader:
+            # Another owner may have replaced the board meanwhile, and its message ID
+            # change doesn't bump the version, so reload and re-resolve everything
+            self.catalog = None
+            self.board_message = None
+            self.reconciled = False
+        
+        if not self.reconciled:
+            await self.reconcile_board()
+        elif (await self.get_catalog()).version != self.rendered_version:
+            self.request_board_update()
+    
+    async def lease_loop(self):
+        """Renew the board lease well before it expires"""
+        while True:
+            await asyncio.sleep(LEASE_TTL / 3)
+            try:
+                await self.renew_lease()
+            except Exception as e:
+                logger.error(f"Failed to renew status board lease: {e}")
+    
+    async def close_backend(self):
+        """Hand the board lease to another process and close the database"""
+        if self.backend:
+            try:
+                await self.backend.release_lease('status_board')
+            finally:
+                # Close even if the release failed; the lease then expires after LEASE_TTL
+                await self.backend.close()
+                self.backend = None
 
 # Initialize the game status handler
 game_handler = GameStatusBot()
 
+class WebhookNotifier:
+    """Deliver product change events to webhook subscribers in the background"""
+
+    def __init__(self, urls, queue_file='data/webhook_queue.json'):
+        self.urls = urls
+        self.queue_file = queue_file
+        self.pending = {url: [] for url in urls}
+        self.retry_queue = self.load_retry_queue()
+        self.in_flight = []
+        self.wakeup = asyncio.Event()
+        self.stopping = False
+        self.session = None
+        self.task = None
+
+    def load_retry_queue(self):
+        """Load undelivered batches left over from a previous run"""
+        if os.path.exists(self.queue_file):
+            try:
+                with open(self.queue_file, 'r') as f:
+                    return [entry for entry in json.load(f) if entry.get('url') in self.pending]
+            except (json.JSONDecodeError, FileNotFoundError, AttributeError):
+                pass
+        return []
+
+    def save_retry_queue(self):
+        """Persist undelivered and in-flight batches, keeping only the newest WEBHOOK_MAX_QUEUE retries"""
+        if len(self.retry_queue) > WEBHOOK_MAX_QUEUE:
+            dropped = len(self.retry_queue) - WEBHOOK_MAX_QUEUE
+            self.retry_queue = self.retry_queue[dropped:]
+            logger.warning(f"Webhook retry queue full, dropped {dropped} oldest batches")
+        with open(self.queue_file, 'w') as f:
+            # In-flight batches are saved too, so a crash mid-delivery resends rather than loses them
+            json.dump(self.retry_queue + self.in_flight, f)
+
+    async def start(self):
+        """Open the shared HTTP session and start the delivery task"""
+        if not self.urls:
+            return
+        connector = aiohttp.TCPConnector(limit=WEBHOOK_POOL_SIZE, ttl_dns_cache=300)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+        self.task = asyncio.create_task(self.run())
+        if self.retry_queue:
+            logger.info(f"Resuming {len(self.retry_queue)} undelivered webhook batches")
+        logger.info(f"Webhook delivery started for {len(self.urls)} subscribers")
+
+    def notify(self, event, name, old_status=None, new_status=None):
+        """Queue a change event for every subscriber without waiting on delivery"""
+        if not self.urls:
+            return
+        payload = {
+            "event": event,
+            "game": name,
+            "old_status": old_status,
+            "status": new_status,
+            "timestamp": nextcord.utils.utcnow().isoformat()
+        }
+        for events in self.pending.values():
+            events.append(payload)
+        self.wakeup.set()
+
+    def next_retry_delay(self):
+        """Seconds until the earliest retry is due, or None if nothing is waiting"""
+        if not self.retry_queue:
+            return None
+        earliest = min(entry['next_attempt'] for entry in self.retry_queue)
+        return max(0.0, earliest - time.time())
+
+    async def run(self):
+        """Batch pending events per subscriber and deliver them until close() is called"""
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.next_retry_delay())
+                # Give closely spaced changes a chance to share one request
+                if not self.stopping:
+                    await asyncio.sleep(WEBHOOK_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Webhook delivery failed: {e}")
+            # Keep going while events queued during the last flush are still waiting
+            if self.stopping and not self.wakeup.is_set():
+                return
+
+    async def flush(self):
+        """Send all pending batches and any retries that are due"""
+        now = time.time()
+        batches = []
+        for url, events in self.pending.items():
+            while events:
+                batches.append({'url': url, 'events': events[:WEBHOOK_BATCH_SIZE], 'attempts': 0, 'next_attempt': now})
+                del events[:WEBHOOK_BATCH_SIZE]
+
+        due = [entry for entry in self.retry_queue if entry['next_attempt'] <= now]
+        if due:
+            self.retry_queue = [entry for entry in self.retry_queue if entry['next_attempt'] > now]
+        batches.extend(due)
+        if not batches:
+            return
+
+        # Write the batches to disk before sending, so they survive a crash or kill mid-delivery
+        self.in_flight = batches
+        self.save_retry_queue()
+        results = await asyncio.gather(*(self.deliver(batch['url'], batch['events']) for batch in batches))
+        self.in_flight = []
+
+        for batch, delivered in zip(batches, results):
+            if delivered:
+                continue
+            batch['attempts'] += 1
+            if batch['attempts'] >= WEBHOOK_MAX_RETRIES:
+                logger.error(f"Giving up on {len(batch['events'])} webhook events for {batch['url']}")
+                continue
+            # Exponential backoff: 2s, 4s, 8s ... capped at 10 minutes
+            batch['next_attempt'] = time.time() + min(2 ** batch['attempts'], 600)
+            self.retry_queue.append(batch)
+
+        self.save_retry_queue()
+
+    async def deliver(self, url, events):
+        """POST one batch of events to a subscriber"""
+        try:
+            async with self.session.post(url, json={"events": events}) as response:
+                if response.status < 300:
+                    return True
+                logger.warning(f"Webhook {url} responded with status {response.status}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Webhook {url} unreachable: {e}")
+        return False
+
+    def save_pending(self):
+        """Write queued and in-flight events to the retry queue file for the next run"""
+        now = time.time()
+        for url, events in self.pending.items():
+            while events:
+                self.retry_queue.append({'url': url, 'events': events[:WEBHOOK_BATCH_SIZE], 'attempts': 0, 'next_attempt': now})
+                del events[:WEBHOOK_BATCH_SIZE]
+        self.retry_queue.extend(self.in_flight)
+        self.in_flight = []
+        self.save_retry_queue()
+
+    async def close(self, timeout=None):
+        """Let the delivery task finish its current and final flush, then release the HTTP session
+
+        After `timeout` seconds delivery is stopped, whatever is left is saved for the
+        next run, and asyncio.TimeoutError is raised.
+        """
+        try:
+            if self.task:
+                self.stopping = True
+                self.wakeup.set()
+                try:
+                    await asyncio.wait_for(asyncio.shield(self.task), timeout)
+                except asyncio.TimeoutError:
+                    self.task.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await self.task
+                    raise
+                finally:
+                    self.task = None
+        finally:
+            if self.in_flight or any(self.pending.values()):
+                self.save_pending()
+            if self.session:
+                await self.session.close()
+                self.session = None
+
+# Initialize webhook notifications
+webhook_notifier = WebhookNotifier(WEBHOOK_URLS)
+
+# Set on SIGTERM/SIGINT; commands that change state are refused from then on
+shutdown_requested = asyncio.Event()
+
+class IdempotencyCache:
+    """TTL-bounded LRU of recent command replies, so duplicate submissions skip the work"""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()  # key -> (expires, catalog version, reply)
+        self.hits = 0
+        self.misses = 0
+        self.noops = 0
+
+    def keys(self, interaction, command, args):
+        # A retried interaction keeps its ID; a double-click repeats user, command and arguments
+        return ('interaction', interaction.id), (interaction.user.id, command, args)
+
+    def lookup(self, interaction, command, args, version):
+        """Return the reply to replay for a duplicate submission, or None"""
+        now = time.monotonic()
+        interaction_key, args_key = self.keys(interaction, command, args)
+        for key in (interaction_key, args_key):
+            entry = self.entries.get(key)
+            if entry is None:
+                continue
+            expires, entry_version, reply = entry
+            # Repeated arguments only count as a duplicate while nothing else has changed
+            if expires <= now or (key is args_key and entry_version != version):
+                del self.entries[key]
+                continue
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return reply
+        self.misses += 1
+        return None
+
+    def store(self, interaction, command, args, version, reply):
+        expires = time.monotonic() + self.ttl
+        for key in self.keys(interaction, command, args):
+            self.entries[key] = (expires, version, reply)
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def record_noop(self):
+        """Count a change that was skipped because it matched the current state"""
+        self.noops += 1
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "noops": self.noops, "entries": len(self.entries)}
+
+# Initialize duplicate submission tracking
+idempotency_cache = IdempotencyCache(IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_ENTRIES)
+
 def is_admin(interaction):
     """Check if user is an admin"""
-    return interaction.user.id in ADMIN_IDS
+    with tracer.span('permission_check'):
+        return interaction.user.id in ADMIN_IDS
+
+async def respond(interaction, *args, **kwargs):
+    """Send an interaction reply ahead of any queued background Discord calls"""
+    with tracer.span('discord.interaction_response'):
+        async with discord_scheduler.interaction():
+            await interaction.response.send_message(*args, **kwargs)
+
+async def reject_if_shutting_down(interaction):
+    """Turn away state-changing commands once shutdown has started"""
+    if shutdown_requested.is_set():
+        await respond(interaction, "⏳ The bot is restarting, please try again in a moment.", ephemeral=True)
+        return True
+    return False
 
 # Web server for Render.com health checks
 async def health_check(request):
     """Health check endpoint for Render.com"""
     return web.Response(text="Bot is running!", status=200)
 
+# Cached /status payload so frequent polling doesn't reload the data file
+status_cache = {'expires': 0.0, 'data': None}
+
 async def status_endpoint(request):
     """Status endpoint showing bot information"""
-    data = game_handler.load_data()
-    games_count = len(data.get('games', {}))
+    now = time.monotonic()
+    if status_cache['data'] is not None and now < status_cache['expires']:
+        return web.json_response(status_cache['data'])
+    
+    games = await game_handler.get_catalog()
     
     response_data = {
         "status": "online",
         "bot_name": str(bot.user) if bot.user else "Not connected",
-        "games_tracked": games_count,
+        "games_tracked": len(games),
+        "status_counts": games.status_counts(),
+        "idempotency_cache": idempotency_cache.stats(),
         "channel_id": CHANNEL_ID
     }
     
+    status_cache['data'] = response_data
+    status_cache['expires'] = now + WEB_STATUS_CACHE_TTL
     return web.json_response(response_data)
 
-async def create_web_server():
+class LoopLagMonitor:
+    """Measure how late the event loop runs a short timer, i.e. how long callbacks wait their turn"""
+    
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.lag = 0.0
+        self.task = None
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = loop.time() - start - self.interval
+    
+    async def start(self, app):
+        self.task = asyncio.create_task(self.run())
+    
+    async def stop(self, app):
+        if self.task:
+            self.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.task
+            self.task = None
+
+def create_load_shedding_middleware(monitor, max_lag, exempt_paths=('/', '/health')):
+    """Reject requests with 503 while the event loop lags more than max_lag seconds
+    
+    Every request shares the event loop with the Discord gateway. Handlers are short
+    (an uncached /status waits only on a database read in sqlite mode, which runs
+    on its own thread), so heavy polling shows up as loop lag rather than as many slow
+    requests, and lag is what delays the gateway. Health checks are always answered so
+    the host never restarts a busy bot.
+    """
+    @web.middleware
+    async def load_shedding_middleware(request, handler):
+        if monitor.lag > max_lag and request.path not in exempt_paths:
+            response = web.Response(text="Server busy", status=503, headers={'Retry-After': '1'})
+            # Make the client reconnect, which slows down whoever is flooding us
+            response.force_close()
+            return response
+        return await handler(request)
+    
+    return load_shedding_middleware
+
+async def create_web_server(port=PORT):
     """Create and start the web server for Render.com"""
-    app = web.Application()
+    lag_monitor = LoopLagMonitor()
+    app = web.Application(middlewares=[create_load_shedding_middleware(lag_monitor, WEB_MAX_LOOP_LAG)])
+    app.on_startup.append(lag_monitor.start)
+    app.on_cleanup.append(lag_monitor.stop)
     app.router.add_get('/', health_check)
     app.router.add_get('/health', health_check)
     app.router.add_get('/status', status_endpoint)
     
-    runner = web.AppRunner(app)
+    # access_log=None skips per-request log formatting under heavy polling
+    runner = web.AppRunner(
+        app,
+        access_log=web.access_logger if WEB_ACCESS_LOG else None,
+        keepalive_timeout=WEB_KEEPALIVE_TIMEOUT
+    )
     await runner.setup()
-    site = web.TCPSite(runner, '0.0.0.0', PORT)
+    site = web.TCPSite(runner, '0.0.0.0', port)
     await site.start()
-    logger.info(f"Web server started on port {PORT}")
+    logger.info(f"Web server started on port {port}")
+    return runner
 
 @bot.event
+@tracer.traced('on_ready')
 async def on_ready():
     """Bot startup event"""
     print(f'{bot.user} has connected to Discord!')
     logger.info(f"Bot connected as {bot.user}")
     
-    # Get the target channel
-    channel = bot.get_channel(CHANNEL_ID)
-    if not channel:
-        print(f"Error: Could not find channel with ID {CHANNEL_ID}")
-        logger.error(f"Could not find channel with ID {CHANNEL_ID}")
+    # With a shared backend only the process holding the board lease touches the board
+    if game_handler.backend:
+        try:
+            await game_handler.renew_lease()
+        except Exception as e:
+            logger.error(f"Failed to initialize status board: {e}")
         return
     
-    # Load existing data
-    data = game_handler.load_data()
-    games = data.get('games', {})
-    message_id = data.get('message_id')
+    # on_ready fires again after every gateway reconnect; the board only needs
+    # work if it changed while we were away
+    if game_handler.reconciled:
+        if game_handler.rendered_version == (await game_handler.get_catalog()).version:
+            logger.info("Reconnected, status board already up to date")
+        else:
+            game_handler.request_board_update()
+        return
     
-    # Update or create the status board
+    # Find the existing board, clean up duplicates and bring it up to date
     try:
-        new_message_id = await game_handler.update_status_board(channel, games, message_id)
-        
-        # Save the message ID if it changed
-        if new_message_id != message_id:
-            data['message_id'] = new_message_id
-            game_handler.save_data(data)
+        await game_handler.reconcile_board()
         
         print(f"Status board ready in channel ID: {CHANNEL_ID}")
         logger.info(f"Status board initialized in channel {CHANNEL_ID}")
+    except (nextcord.NotFound, nextcord.Forbidden) as e:
+        print(f"Error: Could not access channel with ID {CHANNEL_ID}")
+        logger.error(f"Could not access channel with ID {CHANNEL_ID}: {e}")
     except Exception as e:
         logger.error(f"Failed to initialize status board: {e}")
 
 @bot.slash_command(name="addgame", description="Add a new game to track")
+@tracer.traced('addgame')
 async def add_game(
     interaction: nextcord.Interaction,
     name: str = SlashOption(description="Game name to add"),
@@ -206,37 +1477,46 @@ async def add_game(
 ):
     """Add a new game to the status tracker"""
     if not is_admin(interaction):
-        await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
+        await respond(interaction, "❌ You don't have permission to use this command.", ephemeral=True)
+        return
+    
+    if await reject_if_shutting_down(interaction):
         return
     
     # Load current data
-    data = game_handler.load_data()
-    games = data.get('games', {})
+    games = await game_handler.get_catalog()
+    
+    # Replay the earlier reply for a duplicate submission instead of redoing the work
+    args = (name.lower(), status)
+    with tracer.span('idempotency_check'):
+        reply = idempotency_cache.lookup(interaction, 'addgame', args, games.version)
+    if reply is not None:
+        await respond(interaction, reply, ephemeral=True)
+        return
     
     # Check if game already exists
-    if name.lower() in [g.lower() for g in games.keys()]:
-        await interaction.response.send_message(f"❌ Game '{name}' already exists. Use `/setstatus` to update it.", ephemeral=True)
+    if games.find(name) is not None:
+        await respond(interaction, f"❌ Game '{name}' already exists. Use `/setstatus` to update it.", ephemeral=True)
         return
     
     # Add the game
-    games[name] = status
-    data['games'] = games
-    game_handler.save_data(data)
+    with tracer.span('mutation'):
+        added = await game_handler.add_game(name, status)
+    if not added:
+        await respond(interaction, f"❌ Game '{name}' already exists. Use `/setstatus` to update it.", ephemeral=True)
+        return
+    webhook_notifier.notify('game_added', name, new_status=status)
     
     # Update the status board
-    channel = bot.get_channel(CHANNEL_ID)
-    if channel:
-        try:
-            message_id = await game_handler.update_status_board(channel, games, data.get('message_id'))
-            data['message_id'] = message_id
-            game_handler.save_data(data)
-        except Exception as e:
-            logger.error(f"Failed to update status board: {e}")
+    game_handler.request_board_update()
     
-    status_text = status.replace('_', ' ').title()
-    await interaction.response.send_message(f"✅ Added '{name}' with status '{status_text}'", ephemeral=True)
+    status_text = STATUS_TEXT[status]
+    reply = f"✅ Added '{name}' with status '{status_text}'"
+    idempotency_cache.store(interaction, 'addgame', args, (await game_handler.get_catalog()).version, reply)
+    await respond(interaction, reply, ephemeral=True)
 
 @bot.slash_command(name="setstatus", description="Update the status of a game")
+@tracer.traced('setstatus')
 async def set_status(
     interaction: nextcord.Interaction,
     name: str = SlashOption(description="Game name to update"),
@@ -244,62 +1524,70 @@ async def set_status(
 ):
     """Update the status of an existing game"""
     if not is_admin(interaction):
-        await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
+        await respond(interaction, "❌ You don't have permission to use this command.", ephemeral=True)
+        return
+    
+    if await reject_if_shutting_down(interaction):
         return
     
     # Load current data
-    data = game_handler.load_data()
-    games = data.get('games', {})
+    games = await game_handler.get_catalog()
+    
+    # Replay the earlier reply for a duplicate submission instead of redoing the work
+    args = (name.lower(), status)
+    with tracer.span('idempotency_check'):
+        reply = idempotency_cache.lookup(interaction, 'setstatus', args, games.version)
+    if reply is not None:
+        await respond(interaction, reply, ephemeral=True)
+        return
     
     # Find the game (case-insensitive)
-    game_key = None
-    for key in games.keys():
-        if key.lower() == name.lower():
-            game_key = key
-            break
+    game_key = games.find(name)
     
     if not game_key:
-        await interaction.response.send_message(f"❌ Game '{name}' not found. Use `/listgames` to see all games.", ephemeral=True)
+        await respond(interaction, f"❌ Game '{name}' not found. Use `/listgames` to see all games.", ephemeral=True)
+        return
+    
+    # Nothing to save or redraw when the status is unchanged
+    if games.status(game_key) == status:
+        idempotency_cache.record_noop()
+        await respond(interaction, f"ℹ️ '{game_key}' is already '{STATUS_TEXT[status]}'", ephemeral=True)
         return
     
     # Update the status
-    old_status = games[game_key].replace('_', ' ').title()
-    games[game_key] = status
-    data['games'] = games
-    game_handler.save_data(data)
+    with tracer.span('mutation'):
+        previous_status = await game_handler.set_game_status(game_key, status)
+    if previous_status is None:
+        await respond(interaction, f"❌ Game '{name}' not found. Use `/listgames` to see all games.", ephemeral=True)
+        return
+    old_status = previous_status.replace('_', ' ').title()
+    webhook_notifier.notify('status_changed', game_key, previous_status, status)
     
     # Update the status board
-    channel = bot.get_channel(CHANNEL_ID)
-    if channel:
-        try:
-            message_id = await game_handler.update_status_board(channel, games, data.get('message_id'))
-            data['message_id'] = message_id
-            game_handler.save_data(data)
-        except Exception as e:
-            logger.error(f"Failed to update status board: {e}")
+    game_handler.request_board_update()
     
-    new_status = status.replace('_', ' ').title()
-    await interaction.response.send_message(f"✅ Updated '{game_key}' from '{old_status}' to '{new_status}'", ephemeral=True)
+    new_status = STATUS_TEXT[status]
+    reply = f"✅ Updated '{game_key}' from '{old_status}' to '{new_status}'"
+    idempotency_cache.store(interaction, 'setstatus', args, (await game_handler.get_catalog()).version, reply)
+    await respond(interaction, reply, ephemeral=True)
 
 class RemoveGameView(nextcord.ui.View):
-    def __init__(self, games_dict):
+    def __init__(self, games):
         super().__init__(timeout=60)
-        self.games_dict = games_dict
-        self.add_item(RemoveGameSelect(games_dict))
+        self.games = games
+        self.add_item(RemoveGameSelect(games))
 
 class RemoveGameSelect(nextcord.ui.Select):
-    def __init__(self, games_dict):
-        self.games_dict = games_dict
+    def __init__(self, games):
+        self.games = games
         
-        # Create options for each game
+        # Create options for the first games alphabetically (Discord allows at most 25)
         options = []
-        for game_name, status in sorted(games_dict.items()):
-            emoji = STATUS_EMOJIS.get(status, '⚪')
-            status_text = status.replace('_', ' ').title()
+        for game_name, code in itertools.islice(games.items(), 25):
             options.append(nextcord.SelectOption(
                 label=game_name,
-                description=f"Status: {status_text}",
-                emoji=emoji,
+                description=f"Status: {games.texts[code]}",
+                emoji=games.emojis[code],
                 value=game_name
             ))
         
@@ -310,55 +1598,57 @@ class RemoveGameSelect(nextcord.ui.Select):
             options=options
         )
     
+    @tracer.traced('removegame_select')
     async def callback(self, interaction: nextcord.Interaction):
-        # Load current data
-        data = game_handler.load_data()
-        games = data.get('games', {})
+        if await reject_if_shutting_down(interaction):
+            return
         
-        removed_games = []
-        for game_name in self.values:
-            if game_name in games:
-                del games[game_name]
-                removed_games.append(game_name)
+        # Replay the earlier reply for a duplicate submission instead of redoing the work
+        args = tuple(sorted(self.values))
+        with tracer.span('idempotency_check'):
+            message = idempotency_cache.lookup(interaction, 'removegame', args, (await game_handler.get_catalog()).version)
         
-        # Save updated data
-        data['games'] = games
-        game_handler.save_data(data)
-        
-        # Update the status board
-        channel = bot.get_channel(CHANNEL_ID)
-        if channel:
-            try:
-                message_id = await game_handler.update_status_board(channel, games, data.get('message_id'))
-                data['message_id'] = message_id
-                game_handler.save_data(data)
-            except Exception as e:
-                logger.error(f"Failed to update status board: {e}")
-        
-        if removed_games:
-            removed_list = "', '".join(removed_games)
-            if len(removed_games) == 1:
-                message = f"✅ Removed '{removed_list}' from tracking"
+        if message is None:
+            # Remove and save the selected games
+            removed_games = []
+            with tracer.span('mutation'):
+                for game_name, old_status in await game_handler.remove_games(self.values):
+                    removed_games.append(game_name)
+                    webhook_notifier.notify('game_removed', game_name, old_status)
+            
+            if removed_games:
+                # Update the status board
+                game_handler.request_board_update()
+                
+                removed_list = "', '".join(removed_games)
+                if len(removed_games) == 1:
+                    message = f"✅ Removed '{removed_list}' from tracking"
+                else:
+                    message = f"✅ Removed {len(removed_games)} games: '{removed_list}'"
+                idempotency_cache.store(interaction, 'removegame', args, (await game_handler.get_catalog()).version, message)
             else:
-                message = f"✅ Removed {len(removed_games)} games: '{removed_list}'"
-        else:
-            message = "❌ No games were removed"
+                message = "❌ No games were removed"
         
-        await interaction.response.edit_message(content=message, view=None)
+        with tracer.span('discord.interaction_response'):
+            async with discord_scheduler.interaction():
+                await interaction.response.edit_message(content=message, view=None)
 
 @bot.slash_command(name="removegame", description="Remove games from tracking")
+@tracer.traced('removegame')
 async def remove_game(interaction: nextcord.Interaction):
     """Remove games from the status tracker using a selection menu"""
     if not is_admin(interaction):
-        await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
+        await respond(interaction, "❌ You don't have permission to use this command.", ephemeral=True)
+        return
+    
+    if await reject_if_shutting_down(interaction):
         return
     
     # Load current data
-    data = game_handler.load_data()
-    games = data.get('games', {})
+    games = await game_handler.get_catalog()
     
     if not games:
-        await interaction.response.send_message("❌ No games are currently being tracked. Use `/addgame` to add some first.", ephemeral=True)
+        await respond(interaction, "❌ No games are currently being tracked. Use `/addgame` to add some first.", ephemeral=True)
         return
     
     # Create the selection view
@@ -370,44 +1660,59 @@ async def remove_game(interaction: nextcord.Interaction):
         color=0xFF6B6B
     )
     
-    await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+    await respond(interaction, embed=embed, view=view, ephemeral=True)
 
 @bot.slash_command(name="updatestatusboard", description="Manually refresh the status board")
+@tracer.traced('updatestatusboard')
 async def update_status_board_command(interaction: nextcord.Interaction):
     """Manually update the status board"""
     if not is_admin(interaction):
-        await interaction.response.send_message("❌ You don't have permission to use this command.", ephemeral=True)
+        await respond(interaction, "❌ You don't have permission to use this command.", ephemeral=True)
+        return
+    
+    if await reject_if_shutting_down(interaction):
+        return
+    
+    # Another process owns the board; hand the refresh to it instead of posting a second board
+    if not game_handler.is_leader:
+        await game_handler.backend.request_refresh()
+        await respond(interaction, f"✅ Status board refresh requested, it will update within {LEASE_TTL / 3:.0f} seconds.", ephemeral=True)
         return
     
     # Load current data
-    data = game_handler.load_data()
-    games = data.get('games', {})
+    games = await game_handler.get_catalog()
     
     # Update the status board
-    channel = bot.get_channel(CHANNEL_ID)
+    channel = game_handler.board_channel or bot.get_channel(CHANNEL_ID)
     if not channel:
-        await interaction.response.send_message("❌ Could not find the configured channel.", ephemeral=True)
+        await respond(interaction, "❌ Could not find the configured channel.", ephemeral=True)
         return
     
+    # Acknowledge first: the board edit may wait out a rate limit longer than the interaction deadline
+    with tracer.span('discord.interaction_response'):
+        async with discord_scheduler.interaction():
+            await interaction.response.defer(ephemeral=True)
+    
     try:
-        message_id = await game_handler.update_status_board(channel, games, data.get('message_id'))
-        data['message_id'] = message_id
-        game_handler.save_data(data)
+        message_id = await game_handler.update_status_board(channel, games, game_handler.message_id)
+        if message_id != game_handler.message_id:
+            game_handler.message_id = message_id
+            await game_handler.persist()
         
-        await interaction.response.send_message("✅ Status board updated successfully!", ephemeral=True)
+        await interaction.followup.send("✅ Status board updated successfully!", ephemeral=True)
     except Exception as e:
         logger.error(f"Failed to update status board: {e}")
-        await interaction.response.send_message(f"❌ Failed to update status board: {str(e)}", ephemeral=True)
+        await interaction.followup.send(f"❌ Failed to update status board: {str(e)}", ephemeral=True)
 
 @bot.slash_command(name="listgames", description="List all tracked games")
+@tracer.traced('listgames')
 async def list_games(interaction: nextcord.Interaction):
     """List all games currently being tracked"""
     # Load current data
-    data = game_handler.load_data()
-    games = data.get('games', {})
+    games = await game_handler.get_catalog()
     
     if not games:
-        await interaction.response.send_message("❌ No games are currently being tracked. Use `/addgame` to add some first.", ephemeral=True)
+        await respond(interaction, "❌ No games are currently being tracked. Use `/addgame` to add some first.", ephemeral=True)
         return
     
     # Create embed with game list
@@ -416,67 +1721,149 @@ async def list_games(interaction: nextcord.Interaction):
         color=0x5865F2
     )
     
-    game_list = []
-    for game_name, status in sorted(games.items()):
-        emoji = STATUS_EMOJIS.get(status, '⚪')
-        status_text = status.replace('_', ' ').title()
-        game_list.append(f"{emoji} **{game_name}** - {status_text}")
-    
-    embed.description = '\n'.join(game_list)
+    emojis = games.emojis
+    texts = games.texts
+    embed.description = '\n'.join(
+        f"{emojis[code]} **{game_name}** - {texts[code]}" for game_name, code in games.items()
+    )
     embed.set_footer(text=f"Total: {len(games)} games")
     
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    await respond(interaction, embed=embed, ephemeral=True)
+
+async def shutdown(runner, bot_task, lease_task=None):
+    """Stop taking commands, flush pending work and close everything within SHUTDOWN_TIMEOUT"""
+    logger.info("Shutting down, no longer accepting commands")
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    clean = True
+    
+    def remaining(minimum=0.0):
+        return max(minimum, deadline - time.monotonic())
+    
+    # Let queued board edits and webhook deliveries finish; webhooks still undelivered
+    # at the deadline are saved to the retry queue file
+    for name, pending in (("board updates", lambda: asyncio.wait_for(discord_scheduler.join(), remaining())),
+                          ("webhook deliveries", lambda: webhook_notifier.close(remaining()))):
+        try:
+            await pending()
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out waiting for {name} to finish")
+            clean = False
+        except Exception as e:
+            logger.error(f"Failed to finish {name}: {e}")
+            clean = False
+    
+    if game_handler.catalog is not None and game_handler.is_leader:
+        try:
+            await game_handler.persist(fsync=True)
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Failed to save state: {e}")
+            clean = False
+    
+    # Stop renewing first, so a renewal already in progress can't race the release
+    if lease_task:
+        lease_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await lease_task
+    try:
+        await asyncio.wait_for(game_handler.close_backend(), remaining(1.0))
+    except asyncio.TimeoutError:
+        logger.warning("Timed out releasing the status board lease")
+        clean = False
+    except Exception as e:
+        logger.error(f"Failed to release the status board lease: {e}")
+        clean = False
+    
+    # Closing gets at least a second per step even when the flush used up the deadline
+    for name, closing in (("web server", runner.cleanup),
+                          ("Discord connection", None if bot.is_closed() else bot.close)):
+        if closing is None:
+            continue
+        try:
+            await asyncio.wait_for(closing(), remaining(1.0))
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out closing the {name}")
+            clean = False
+        except Exception as e:
+            logger.error(f"Failed to close the {name}: {e}")
+            clean = False
+    if bot_task:
+        try:
+            await asyncio.wait_for(bot_task, remaining(1.0))
+        except asyncio.TimeoutError:
+            logger.warning("Timed out waiting for the Discord client to stop")
+            clean = False
+    
+    if clean:
+        game_handler.write_shutdown_marker()
+    logger.info("Service stopped")
+
+async def run_bot():
+    """Connect to Discord, keeping the web server alive if that fails"""
+    try:
+        await bot.start(DISCORD_TOKEN.strip())
+    except nextcord.errors.LoginFailure:
+        logger.error("Discord token is invalid or expired")
+        logger.error("Please get a new token from: https://discord.com/developers/applications")
+        logger.error("Then update your .env file with the new DISCORD_TOKEN")
+    except Exception as e:
+        logger.error(f"Failed to start bot: {e}")
 
 async def main():
     """Main function to run both the web server and Discord bot"""
+    if game_handler.consume_shutdown_marker():
+        logger.info("Previous run shut down cleanly, skipping integrity checks")
+    
+    # Share state and board ownership with other processes
+    lease_task = None
+    if STATE_BACKEND == 'sqlite':
+        await game_handler.open_backend()
+        lease_task = asyncio.create_task(game_handler.lease_loop())
+        logger.info(f"Using shared state in {STATE_DB}")
+    
+    # Load state before serving anything, so a damaged snapshot stops the bot right away
+    await game_handler.get_catalog()
+    
     # Start the web server
-    await create_web_server()
+    runner = await create_web_server()
     logger.info("Web server started successfully")
     
+    # Start webhook delivery
+    await webhook_notifier.start()
+    
+    # Render sends SIGTERM on redeploy; a second signal aborts a shutdown that hangs
+    def request_shutdown():
+        if shutdown_requested.is_set():
+            logger.warning("Second stop signal received, exiting immediately")
+            os._exit(1)
+        shutdown_requested.set()
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, request_shutdown)
+        except NotImplementedError:
+            # Not supported on Windows; Ctrl+C still stops the process
+            pass
+    
+    bot_task = None
+    
     # Debug token information
     if not DISCORD_TOKEN:
         logger.error("DISCORD_TOKEN not found in environment variables")
         logger.error("Please set your Discord bot token in the .env file")
         logger.error("Get a token from: https://discord.com/developers/applications")
         # Keep web server running even without Discord token
-        try:
-            await asyncio.Future()  # Run forever
-        except KeyboardInterrupt:
-            logger.info("Service stopped")
-        return
-    
-    # Validate token format
-    token_parts = DISCORD_TOKEN.strip().split('.')
-    if len(token_parts) != 3:
+    elif len(DISCORD_TOKEN.strip().split('.')) != 3:
+        # Validate token format
         logger.error("Invalid Discord token format. Token should have 3 parts separated by dots")
         logger.error("Please get a new token from: https://discord.com/developers/applications")
         # Keep web server running with invalid token
-        try:
-            await asyncio.Future()  # Run forever
-        except KeyboardInterrupt:
-            logger.info("Service stopped")
-        return
     else:
         logger.info("Discord token format appears valid")
+        bot_task = asyncio.create_task(run_bot())
     
-    try:
-        await bot.start(DISCORD_TOKEN.strip())
-    except nextcord.errors.LoginFailure:
-        logger.error("Discord token is invalid or expired")
-        logger.error("Please get a new token from: https://discord.com/developers/applications")
-        logger.error("Then update your .env file with the new DISCORD_TOKEN")
-        # Keep web server running even if Discord connection fails
-        try:
-            await asyncio.Future()  # Run forever
-        except KeyboardInterrupt:
-            logger.info("Service stopped")
-    except Exception as e:
-        logger.error(f"Failed to start bot: {e}")
-        # Keep web server running even if Discord connection fails
-        try:
-            await asyncio.Future()  # Run forever
-        except KeyboardInterrupt:
-            logger.info("Service stopped")
+    await shutdown_requested.wait()
+    await shutdown(runner, bot_task, lease_task)
 
 if __name__ == "__main__":
     asyncio.run(main())
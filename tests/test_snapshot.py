@@ -0,0 +1,58 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'STATE_FORMAT', 'binary')
+    handler = main.GameStatusBot()
+    handler.data_file = str(tmp_path / 'status.json')
+    handler.snapshot_file = str(tmp_path / 'status.bin')
+    return handler
+
+
+def test_snapshot_round_trip(handler):
+    games = {
+        'Alpha': 'testing',
+        'Beta\0Gamma': 'detected',
+        'Überspiel 🎮': 'undetected',
+        'Legacy': 'retired',
+    }
+    handler.save_snapshot(main.Catalog(games), 1234)
+
+    catalog, message_id = handler.load_snapshot()
+    assert catalog.to_dict() == games
+    assert message_id == 1234
+
+    handler.save_snapshot(main.Catalog(), None)
+    catalog, message_id = handler.load_snapshot()
+    assert len(catalog) == 0
+    assert message_id is None
+
+
+@pytest.mark.parametrize('damage', ['flip_byte', 'truncate'])
+def test_corrupt_snapshot_is_never_replaced(handler, damage):
+    handler.save_data({'games': {'Stale': 'testing'}, 'message_id': 1})
+    handler.save_snapshot(main.Catalog({'Alpha': 'testing', 'Beta': 'detected'}), 2)
+    with open(handler.snapshot_file, 'rb') as f:
+        data = bytearray(f.read())
+    if damage == 'flip_byte':
+        data[-1] ^= 0xFF
+    else:
+        del data[-3:]
+    with open(handler.snapshot_file, 'wb') as f:
+        f.write(data)
+
+    with pytest.raises(RuntimeError, match='invalid snapshot'):
+        asyncio.run(handler.get_catalog())
+
+    assert handler.catalog is None
+    with open(handler.snapshot_file, 'rb') as f:
+        assert f.read() == data